@@ -11,6 +11,13 @@ from reportlab.lib import colors
 from svglib.svglib import svg2rlg
 import segno, io, pandas as pd
 import os
+import icon_gen
+import imposition
+import qr_segments
+import reprint
+import qr_stencil
+import pdf_direct
+import svg_preview
 
 # ----- Label Geometry (2" x 1") -----
 # 1 inch = 25.4 mm
@@ -31,6 +38,12 @@ QR_Y_MM = (LABEL_H_MM - QR_SIZE_MM) / 2
 # Left Zone Center (Center of the left 1" half)
 CONTENT_CENTER_X_MM = LEFT_FRAME_W_MM / 2
 
+# Left Zone content heights (centers / baselines)
+ICON_SIZE_MM = 8.0
+ICON_Y_MM = 20.0  # Moved up from 18.0
+LABEL_Y_MM = 11.0 # Moved down from 12.0 to increase gap
+VALUE_Y_MM = 4.0  # Moved down from 4.5
+
 # ----- Simple Tote Bag Icon SVG -----
 TOTE_BAG_SVG = """<svg width="100" height="120" viewBox="0 0 100 120" fill="none" xmlns="http://www.w3.org/2000/svg">
   <path d="M20 45 L80 45 L 75 95 Q 74 105 60 105 L 40 105 Q 26 105 25 95 L 20 45 Z" stroke="black" stroke-width="5" stroke-linejoin="round"/>
@@ -43,6 +56,44 @@ TOTE_BAG_SVG = """<svg width="100" height="120" viewBox="0 0 100 120" fill="none
 DF_PATH = "production_bags.csv"
 PDF_OUT = "production_bags_labels.pdf"
 
+# ----- Copies -----
+# Identical labels printed per CSV row (e.g. one for the bag, one for the paperwork).
+# Each unique payload is encoded and drawn once as a Form XObject, every copy just references it.
+COPIES_PER_ROW = 1
+
+# ----- QR encoding -----
+# True = encode each payload with an optimal mix of numeric/alphanumeric/byte segments
+# (qr_segments.py) instead of segno's single-mode pick. Same decoded string, fewer bits.
+OPTIMIZE_SEGMENTS = False
+
+# ----- QR stencil -----
+# True = draw QR modules directly (no SVG round trip) and put each version's fixed function
+# patterns (finders, timing, alignment) into one shared Form XObject (qr_stencil.py).
+QR_STENCIL = False
+
+# ----- Reprint index -----
+# Writes <PDF_OUT>.index.csv (serial -> file, page, slot, byte offset, label box) and its
+# sorted fixed-width copy <PDF_OUT>.index.sorted for reprint.py.
+WRITE_INDEX = True
+
+# ----- Output backend -----
+# "reportlab" = canvas.Canvas, supports every option above.
+# "direct" = pdf_direct.py: precompiled content-stream templates with the QR path and bag id
+# spliced in, written page by page. One label per page only (SHEET / QR_STENCIL are ignored).
+# "svg" = svg_preview.py: one lightweight HTML file (PREVIEW_OUT) for QA review in a browser,
+# one label per CSV row with shared artwork in <defs>.
+BACKEND = "reportlab"
+PREVIEW_OUT = "production_bags_preview.html"
+
+# ----- Sheet imposition (N-up) -----
+# None = one label per page, sized to the label (thermal roll).
+# "letter" / "A4" tiles the labels onto sheets; 0 cols/rows fits as many as the sheet allows.
+SHEET = None
+SHEET_COLS, SHEET_ROWS = 0, 0
+SHEET_GUTTER_MM = 2.0
+SHEET_MARGIN_MM = 10.0
+CUT_MARKS = True
+
 
 def draw_svg_content(canvas_obj, svg_string: str, x_mm: float, y_mm: float, size_mm: float):
     """Helper function to draw SVG data from a string onto the canvas centered at (x,y)."""
@@ -61,9 +112,20 @@ def draw_svg_content(canvas_obj, svg_string: str, x_mm: float, y_mm: float, size
     renderPDF.draw(drawing, canvas_obj, x_mm * mm - (drawing.width / 2), y_mm * mm - (drawing.height / 2))
 
 
+def make_qr(data: str, error: str):
+    """segno.make, or the segment-optimized encoder when OPTIMIZE_SEGMENTS is on."""
+    if OPTIMIZE_SEGMENTS:
+        return qr_segments.make_qr(data, error=error)
+    return segno.make(data, error=error)
+
+
 def draw_qr_code(canvas_obj, data: str, x_mm: float, y_mm: float, size_mm: float):
     """Generates and draws the QR code SVG."""
-    qr = segno.make(data, error='M')
+    qr = make_qr(data, error='M')
+    if QR_STENCIL:
+        qr_stencil.draw_qr(canvas_obj, qr, x_mm * mm, y_mm * mm, size_mm * mm, stencil=True)
+        return
+
     buf = io.BytesIO()
     qr.save(buf, kind="svg", border=0)
     svg_string = buf.getvalue().decode('utf-8')
@@ -94,23 +156,162 @@ def draw_aesthetic_content(c, bag_id: str):
     )
 
     # 2. Draw Tote Bag Icon (Shifted UP away from text)
-    ICON_SIZE_MM = 8.0
-    ICON_Y_MM = 20.0 # Moved up from 18.0
     draw_svg_content(c, TOTE_BAG_SVG, CONTENT_CENTER_X_MM, ICON_Y_MM, ICON_SIZE_MM)
 
     # 3. Draw "BAG #" Label (Shifted DOWN slightly)
     c.setFont("Helvetica-Bold", 10)
-    LABEL_Y_MM = 11.0 # Moved down from 12.0 to increase gap
     c.drawCentredString(CONTENT_CENTER_X_MM * mm, LABEL_Y_MM * mm, "BAG #")
 
     # 4. Draw the Variable Number (Large, Bold, shifted down with text)
     c.setFont("Helvetica-Bold", 24)
-    VALUE_Y_MM = 4.0  # Moved down from 4.5
     c.drawCentredString(CONTENT_CENTER_X_MM * mm, VALUE_Y_MM * mm, bag_id)
 
     c.restoreState()
 
 
+def extract_bag_id(payload: str) -> str:
+    """Bag number shown on the label, taken from the payload."""
+    # --- Data Extraction Logic (Adjust based on actual data format) ---
+    # Extracting 3 digits starting from index 3 (e.g., after "SN:")
+    clean_payload = payload.replace(" ", "")
+    return clean_payload[11:14]
+
+
+def draw_label(c, payload: str):
+    """Draws one complete label (framed content + QR) for the given payload."""
+    bag_id = extract_bag_id(payload)
+
+    # 1. Draw Aesthetic Content (Left Side Frame & Data)
+    draw_aesthetic_content(c, bag_id)
+
+    # 2. Draw QR (Right Side, outside frame)
+    draw_qr_code(
+        canvas_obj=c,
+        data=payload,
+        x_mm=QR_X_MM,
+        y_mm=QR_Y_MM,
+        size_mm=QR_SIZE_MM
+    )
+
+
+def label_form(c, payload: str, forms: dict) -> str:
+    """Returns the Form XObject name for payload, encoding and drawing it on first use only."""
+    name = forms.get(payload)
+    if name is None:
+        name = f"Label{len(forms)}"
+        c.beginForm(name, upperx=LABEL_W_MM * mm, uppery=LABEL_H_MM * mm)
+        draw_label(c, payload)
+        c.endForm()
+        forms[payload] = name
+    return name
+
+
+# ----- Direct backend template (same geometry as draw_aesthetic_content) -----
+# TOTE_BAG_SVG as PDF path ops in its own 100x120 viewBox (quadratic curves as cubics);
+# the cm below flips and scales it exactly like svg2rlg + draw_svg_content.
+TOTE_BAG_ICON_OPS = """20 45 m 80 45 l 75 95 l 74.3333 101.6667 69.3333 105 60 105 c
+40 105 l 30.6667 105 25.6667 101.6667 25 95 c 20 45 l h
+5 w 1 j S
+38 45 m 38 25 l 38 21.6667 39.6667 20 43 20 c 57 20 l 60.3333 20 62 21.6667 62 25 c 62 45 l
+1 J S
+""" + pdf_direct.circle_path(38, 50, 3) + pdf_direct.circle_path(62, 50, 3) + "f\n"
+
+def direct_static_ops() -> str:
+    """Frame, icon and "BAG #" caption: identical on every label, built once."""
+    icon_scale = ICON_SIZE_MM * mm / 120
+    icon_x = CONTENT_CENTER_X_MM * mm - 50 * icon_scale
+    icon_y = ICON_Y_MM * mm + 60 * icon_scale
+    fmt = pdf_direct.fmt
+    return (
+        "0 g 0 G\n"
+        + "q 1.5 w\n"
+        + pdf_direct.round_rect_path(
+            MARGIN_MM * mm,
+            MARGIN_MM * mm,
+            (LEFT_FRAME_W_MM - 2 * MARGIN_MM) * mm,
+            (LABEL_H_MM - 2 * MARGIN_MM) * mm,
+            3 * mm,
+        )
+        + "S Q\n"
+        + f"q {fmt(icon_scale, 6)} 0 0 {fmt(-icon_scale, 6)} {fmt(icon_x)} {fmt(icon_y)} cm\n"
+        + TOTE_BAG_ICON_OPS
+        + "Q\n"
+        + pdf_direct.text_ops("BAG #", 10, CONTENT_CENTER_X_MM * mm, LABEL_Y_MM * mm)
+    )
+
+DIRECT_STATIC = direct_static_ops()
+
+
+def direct_label(payload: str) -> str:
+    """Content stream for one label: precompiled frame/icon/caption + bag id + QR path."""
+    qr = make_qr(payload, error="M")
+    return (
+        DIRECT_STATIC
+        + pdf_direct.text_ops(extract_bag_id(payload), 24, CONTENT_CENTER_X_MM * mm, VALUE_Y_MM * mm)
+        + pdf_direct.qr_ops(qr, QR_X_MM * mm, QR_Y_MM * mm, QR_SIZE_MM * mm)
+    )
+
+
+def write_labels_direct(df):
+    """BACKEND = "direct": same labels via pdf_direct, one label per page."""
+    pdf = pdf_direct.DirectPDF(PDF_OUT, (LABEL_W_MM * mm, LABEL_H_MM * mm))
+
+    contents = {}  # payload -> content stream object id, shared by copies and repeats
+    placements = []  # (serial, page, slot) of each row's first copy, for the reprint index
+
+    for _, row in df.iterrows():
+        payload = str(row["qr_data"])
+        content_id = contents.get(payload)
+        if content_id is None:
+            content_id = contents[payload] = pdf.add_content(direct_label(payload))
+
+        for copy in range(COPIES_PER_ROW):
+            page = pdf.add_page(content_id)
+            if copy == 0:
+                placements.append((payload, page, 0))
+
+    pdf.close()
+    if WRITE_INDEX:
+        reprint.write_index(reprint.index_path(PDF_OUT), PDF_OUT, placements, pdf.page_offsets,
+                            [(0, 0)], (LABEL_W_MM * mm, LABEL_H_MM * mm))
+        reprint.build_sorted_index(reprint.index_path(PDF_OUT))
+
+
+# ----- SVG preview template (same geometry as draw_aesthetic_content, y measured from the top) -----
+# Frame, icon and "BAG #" caption are one shared group; the icon comes from icon_gen.
+SVG_ICON_SCALE = ICON_SIZE_MM / 120  # Icon viewBox is 100 x 120
+SVG_DEFS = (
+    svg_preview.svg_group(icon_gen.get_bag_icon(), "bag-icon")
+    + '<g id="bag-static">'
+    + f'<rect x="{MARGIN_MM}" y="{MARGIN_MM}" width="{pdf_direct.fmt(LEFT_FRAME_W_MM - 2 * MARGIN_MM)}" '
+      f'height="{pdf_direct.fmt(LABEL_H_MM - 2 * MARGIN_MM)}" rx="3" fill="none" stroke="black" '
+      f'stroke-width="{pdf_direct.fmt(1.5 * svg_preview.PT_TO_MM)}"/>'
+    + f'<use href="#bag-icon" transform="translate({pdf_direct.fmt(CONTENT_CENTER_X_MM - 50 * SVG_ICON_SCALE)} '
+      f'{pdf_direct.fmt(LABEL_H_MM - ICON_Y_MM - ICON_SIZE_MM / 2)}) scale({pdf_direct.fmt(SVG_ICON_SCALE)})"/>'
+    + svg_preview.text(CONTENT_CENTER_X_MM, LABEL_H_MM - LABEL_Y_MM, 10, "BAG #")
+    + '</g>'
+)
+
+
+def svg_label(preview, payload: str) -> str:
+    """SVG markup for one label: shared frame/icon/caption + bag id + QR data path."""
+    qr = make_qr(payload, error="M")
+    return (
+        '<use href="#bag-static"/>'
+        + svg_preview.text(CONTENT_CENTER_X_MM, LABEL_H_MM - VALUE_Y_MM, 24, extract_bag_id(payload))
+        + preview.qr(qr, QR_X_MM, LABEL_H_MM - QR_Y_MM - QR_SIZE_MM, QR_SIZE_MM)
+    )
+
+
+def write_preview(df):
+    """BACKEND = "svg": every row once, streamed into PREVIEW_OUT."""
+    preview = svg_preview.SVGPreview(PREVIEW_OUT, LABEL_W_MM, LABEL_H_MM, SVG_DEFS, title=DF_PATH)
+    for _, row in df.iterrows():
+        payload = str(row["qr_data"])
+        preview.add_label(svg_label(preview, payload), caption=payload)
+    preview.close()
+
+
 def main():
     # Create dummy data for demonstration if file doesn't exist
     if not os.path.exists(DF_PATH):
@@ -127,33 +328,54 @@ def main():
     else:
         df = pd.read_csv(DF_PATH, dtype={"qr_data": "string"})
 
+    if BACKEND == "svg":
+        write_preview(df)
+        print(f"Successfully generated {PREVIEW_OUT}")
+        return
+
+    if BACKEND == "direct":
+        write_labels_direct(df)
+        print(f"Successfully generated {PDF_OUT}")
+        return
 
     # Create Canvas
-    c = canvas.Canvas(PDF_OUT, pagesize=(LABEL_W_MM * mm, LABEL_H_MM * mm))
+    pagesize, slots = imposition.page_layout(
+        SHEET, LABEL_W_MM, LABEL_H_MM, SHEET_COLS, SHEET_ROWS, SHEET_GUTTER_MM, SHEET_MARGIN_MM
+    )
+    c = canvas.Canvas(PDF_OUT, pagesize=pagesize)
+    cut_marks = CUT_MARKS and SHEET is not None
+    if cut_marks:
+        imposition.define_cut_marks(c, slots, LABEL_W_MM, LABEL_H_MM)
+
+    forms = {}  # payload -> Form XObject name
+    placements = []  # (serial, page, slot) of each row's first copy, for the reprint index
+    slot = 0
+
+    # Forms only pay off when something reuses them (copies, N-up, repeated payloads);
+    # otherwise draw straight onto the page, which is smaller and faster
+    reuse_all = COPIES_PER_ROW > 1 or SHEET is not None
+    repeated = set(df["qr_data"][df["qr_data"].duplicated()].astype(str))
 
     for _, row in df.iterrows():
         payload = str(row["qr_data"])
-        
-        # --- Data Extraction Logic (Adjust based on actual data format) ---
-        # Extracting 3 digits starting from index 3 (e.g., after "SN:")
-        clean_payload = payload.replace(" ", "")
-        bag_id = clean_payload[11:14] 
-
-        # 1. Draw Aesthetic Content (Left Side Frame & Data)
-        draw_aesthetic_content(c, bag_id)
-
-        # 2. Draw QR (Right Side, outside frame)
-        draw_qr_code(
-            canvas_obj=c,
-            data=payload,
-            x_mm=QR_X_MM,
-            y_mm=QR_Y_MM,
-            size_mm=QR_SIZE_MM
-        )
+        placements.append((payload, c.getPageNumber(), slot))
+
+        if not reuse_all and payload not in repeated:
+            draw_label(c, payload)
+            c.showPage()
+            continue
+
+        form_name = label_form(c, payload, forms)
+        for _ in range(COPIES_PER_ROW):
+            slot = imposition.place_label(c, form_name, slots, slot, cut_marks)
 
-        c.showPage()
+    imposition.finish_page(c, slot)
 
     c.save()
+    if WRITE_INDEX:
+        reprint.write_index(reprint.index_path(PDF_OUT), PDF_OUT, placements, reprint.canvas_page_offsets(c),
+                            slots, (LABEL_W_MM * mm, LABEL_H_MM * mm))
+        reprint.build_sorted_index(reprint.index_path(PDF_OUT))
     print(f"Successfully generated {PDF_OUT}")
 
 if __name__ == "__main__":
@@ -0,0 +1,71 @@
+# compare_backends.py
+# Cross-check of BACKEND = "reportlab" vs BACKEND = "direct" for one renderer
+# Renders the same CSV with both backends (index off, single file), rasterises every page
+# with PyMuPDF and counts the pixels that differ. Anti-aliasing is off by default so edge
+# pixels are either equal or not; pass aa=8 to compare what a viewer shows. Also prints the
+# end-to-end time and file size of each backend. Needs PyMuPDF (pip install pymupdf).
+#   python compare_backends.py robot_labels [robot_serials.csv] [dpi] [aa]
+
+import importlib, os, sys, tempfile, time
+import pymupdf
+
+BACKENDS = ("reportlab", "direct")
+
+
+def render(m, backend: str, csv_path: str, pdf_path: str) -> float:
+    """Runs the renderer's main() with the given backend into pdf_path, returns seconds taken."""
+    m.BACKEND = backend
+    m.DF_PATH = csv_path
+    m.PDF_OUT = pdf_path
+    m.WRITE_INDEX = False
+    start = time.perf_counter()
+    m.main()
+    return time.perf_counter() - start
+
+
+def page_pixels(page, dpi: int):
+    """Grayscale samples of one page."""
+    pix = page.get_pixmap(dpi=dpi, colorspace=pymupdf.csGRAY)
+    return (pix.w, pix.h), pix.samples
+
+
+def compare(renderer: str, csv_path: str = None, dpi: int = 300, aa: int = 0):
+    m = importlib.import_module(renderer)
+    csv_path = csv_path or m.DF_PATH
+    tmp_dir = tempfile.mkdtemp(prefix="compare_backends_")
+    paths = {backend: os.path.join(tmp_dir, f"{backend}.pdf") for backend in BACKENDS}
+
+    for backend in BACKENDS:
+        seconds = render(m, backend, csv_path, paths[backend])
+        print(f"{backend:>9}: {seconds:.2f} s, {os.path.getsize(paths[backend]) / 1024:.0f} KiB")
+
+    pymupdf.TOOLS.set_aa_level(aa)
+    docs = [pymupdf.open(paths[backend]) for backend in BACKENDS]
+    if len(docs[0]) != len(docs[1]):
+        print(f"Page count differs: {len(docs[0])} vs {len(docs[1])}")
+        return
+
+    differing_pages, total, worst, worst_page = 0, 0, 0, None
+    for n in range(len(docs[0])):
+        (size_a, a), (size_b, b) = (page_pixels(doc[n], dpi) for doc in docs)
+        if size_a != size_b:
+            print(f"Page {n + 1}: size differs {size_a} vs {size_b}")
+            continue
+        diff = sum(p != q for p, q in zip(a, b))
+        if diff:
+            differing_pages += 1
+            total += diff
+            if diff > worst:
+                worst, worst_page = diff, n + 1
+
+    print(f"{renderer}: {differing_pages}/{len(docs[0])} pages differ at {dpi} dpi (aa level {aa}), "
+          f"{total} pixels in total, worst page {worst_page} with {worst} pixels")
+    print(f"PDFs kept in {tmp_dir}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python compare_backends.py <renderer> [csv] [dpi] [aa]")
+        sys.exit(1)
+    renderer, *rest = sys.argv[1:]
+    compare(renderer, *rest[:1], *(int(v) for v in rest[1:]))
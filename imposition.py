@@ -0,0 +1,95 @@
+# imposition.py
+# N-up sheet imposition for sheet-fed printing (Letter / A4 stock)
+# The renderers draw each label once as a Form XObject; this module only works out
+# the grid and places those forms, so a sheet's content stream is a few "cm /LabelN Do" ops.
+
+from reportlab.lib.pagesizes import letter, A4
+from reportlab.lib.units import mm
+
+SHEET_SIZES = {"letter": letter, "A4": A4}
+
+# ----- Cut mark settings -----
+CUT_MARK_LEN_MM = 4.0
+CUT_MARK_OFFSET_MM = 1.0       # Gap between the label grid and the start of each mark
+CUT_MARK_LINE_WIDTH_PT = 0.25
+CUT_MARKS_FORM = "CutMarks"
+
+
+def page_layout(sheet, label_w_mm: float, label_h_mm: float, cols: int = 0, rows: int = 0,
+                gutter_mm: float = 2.0, margin_mm: float = 10.0):
+    """Returns (pagesize, slots) where slots are the bottom-left corners (pts) of each label in reading order.
+
+    sheet=None keeps the thermal-roll layout: one label per page, sized to the label.
+    cols/rows of 0 fit as many labels as the sheet allows.
+    """
+    if sheet is None:
+        return (label_w_mm * mm, label_h_mm * mm), [(0, 0)]
+
+    sheet_w, sheet_h = SHEET_SIZES[sheet]
+    label_w, label_h = label_w_mm * mm, label_h_mm * mm
+    gutter, margin = gutter_mm * mm, margin_mm * mm
+
+    # How many labels fit between the margins (n labels need n-1 gutters)
+    fit_cols = int((sheet_w - 2 * margin + gutter) // (label_w + gutter))
+    fit_rows = int((sheet_h - 2 * margin + gutter) // (label_h + gutter))
+    cols = cols or fit_cols
+    rows = rows or fit_rows
+    if cols < 1 or rows < 1 or cols > fit_cols or rows > fit_rows:
+        raise ValueError(f"{cols}x{rows} grid of {label_w_mm}x{label_h_mm} mm labels does not fit on {sheet} "
+                         f"(max {fit_cols}x{fit_rows} with {margin_mm} mm margins, {gutter_mm} mm gutters)")
+
+    # Center the grid on the sheet
+    grid_w = cols * label_w + (cols - 1) * gutter
+    grid_h = rows * label_h + (rows - 1) * gutter
+    x0 = (sheet_w - grid_w) / 2
+    top = (sheet_h + grid_h) / 2
+
+    slots = [
+        (x0 + col * (label_w + gutter), top - (row + 1) * label_h - row * gutter)
+        for row in range(rows)
+        for col in range(cols)
+    ]
+    return (sheet_w, sheet_h), slots
+
+
+def define_cut_marks(c, slots, label_w_mm: float, label_h_mm: float):
+    """Draws crop marks outside the grid at every label edge into the shared CutMarks form."""
+    label_w, label_h = label_w_mm * mm, label_h_mm * mm
+    xs = sorted({x for x, _ in slots} | {x + label_w for x, _ in slots})
+    ys = sorted({y for _, y in slots} | {y + label_h for _, y in slots})
+    left, right, bottom, top = xs[0], xs[-1], ys[0], ys[-1]
+    offset, length = CUT_MARK_OFFSET_MM * mm, CUT_MARK_LEN_MM * mm
+
+    c.beginForm(CUT_MARKS_FORM)
+    c.setLineWidth(CUT_MARK_LINE_WIDTH_PT)
+    for x in xs:
+        c.line(x, top + offset, x, top + offset + length)
+        c.line(x, bottom - offset, x, bottom - offset - length)
+    for y in ys:
+        c.line(left - offset, y, left - offset - length, y)
+        c.line(right + offset, y, right + offset + length, y)
+    c.endForm()
+
+
+def place_label(c, form_name: str, slots, slot: int, cut_marks: bool = False) -> int:
+    """Places form_name in the given slot and returns the next free slot, starting a new page when full."""
+    if slot == 0 and cut_marks:
+        c.doForm(CUT_MARKS_FORM)
+
+    x, y = slots[slot]
+    c.saveState()
+    c.translate(x, y)
+    c.doForm(form_name)
+    c.restoreState()
+
+    slot += 1
+    if slot == len(slots):
+        c.showPage()
+        slot = 0
+    return slot
+
+
+def finish_page(c, slot: int):
+    """Emits the last, partially filled page (if any)."""
+    if slot:
+        c.showPage()
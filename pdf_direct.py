@@ -0,0 +1,148 @@
+# pdf_direct.py
+# Minimal streaming PDF writer for the fixed label templates
+# The ReportLab canvas is general purpose; our labels are a few dozen operators each.
+# This writes every page (content stream compressed with zlib) straight to disk as soon
+# as it is added, then the page tree + xref on close(). Only the base-14 Helvetica-Bold
+# font is used, so nothing is embedded. Output is deterministic (no dates / IDs).
+
+import zlib
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from qr_stencil import module_runs, FUNCTION_PATTERN_TYPES, LABEL_MODULE_TYPES
+
+FONT_NAME = "Helvetica-Bold"   # Referenced as /F1 in every content stream
+
+# Object numbers fixed up front; pages and content streams follow from 5 on
+CATALOG_ID, PAGES_ID, FONT_ID, RESOURCES_ID = 1, 2, 3, 4
+
+# Bezier radius multiplier ReportLab uses for roundRect corners, so both backends match
+ROUND_RECT_M = 0.4472
+
+
+def fmt(v: float, digits: int = 4) -> str:
+    """Compact number formatting for content streams (like ReportLab's fp_str).
+
+    Coordinates need 4 decimals; scale factors in a cm need 6, since every unit is multiplied by them.
+    """
+    s = f"{v:.{digits}f}".rstrip("0").rstrip(".")
+    return s if s not in ("", "-0") else "0"
+
+
+def escape_text(text: str) -> str:
+    """Escapes a string for a PDF literal (...)."""
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def text_ops(text: str, font_size: float, x: float, y: float, vertical: bool = False) -> str:
+    """BT..ET block drawing text centred on (x, y) like drawCentredString, in /F1.
+
+    vertical=True rotates the text 90 degrees CCW (reads bottom to top), centred along y.
+    """
+    half_w = stringWidth(text, FONT_NAME, font_size) / 2
+    text = escape_text(text)
+    if vertical:
+        return f"BT /F1 {fmt(font_size)} Tf 0 1 -1 0 {fmt(x)} {fmt(y - half_w)} Tm ({text}) Tj ET\n"
+    return f"BT /F1 {fmt(font_size)} Tf {fmt(x - half_w)} {fmt(y)} Td ({text}) Tj ET\n"
+
+
+def circle_path(cx: float, cy: float, r: float) -> str:
+    """Path ops for a circle as four Bezier quadrants."""
+    k = 0.5523 * r
+    return (
+        f"{fmt(cx + r)} {fmt(cy)} m\n"
+        f"{fmt(cx + r)} {fmt(cy + k)} {fmt(cx + k)} {fmt(cy + r)} {fmt(cx)} {fmt(cy + r)} c\n"
+        f"{fmt(cx - k)} {fmt(cy + r)} {fmt(cx - r)} {fmt(cy + k)} {fmt(cx - r)} {fmt(cy)} c\n"
+        f"{fmt(cx - r)} {fmt(cy - k)} {fmt(cx - k)} {fmt(cy - r)} {fmt(cx)} {fmt(cy - r)} c\n"
+        f"{fmt(cx + k)} {fmt(cy - r)} {fmt(cx + r)} {fmt(cy - k)} {fmt(cx + r)} {fmt(cy)} c\nh\n"
+    )
+
+
+def round_rect_path(x: float, y: float, w: float, h: float, r: float) -> str:
+    """Path ops for a rounded rectangle, same construction as ReportLab's roundRect."""
+    t = ROUND_RECT_M * r
+    xlo, xhi, ylo, yhi = x, x + w, y, y + h
+    pts = [
+        f"{fmt(xlo + r)} {fmt(ylo)} m",
+        f"{fmt(xhi - r)} {fmt(ylo)} l",
+        f"{fmt(xhi - t)} {fmt(ylo)} {fmt(xhi)} {fmt(ylo + t)} {fmt(xhi)} {fmt(ylo + r)} c",
+        f"{fmt(xhi)} {fmt(yhi - r)} l",
+        f"{fmt(xhi)} {fmt(yhi - t)} {fmt(xhi - t)} {fmt(yhi)} {fmt(xhi - r)} {fmt(yhi)} c",
+        f"{fmt(xlo + r)} {fmt(yhi)} l",
+        f"{fmt(xlo + t)} {fmt(yhi)} {fmt(xlo)} {fmt(yhi - t)} {fmt(xlo)} {fmt(yhi - r)} c",
+        f"{fmt(xlo)} {fmt(ylo + r)} l",
+        f"{fmt(xlo)} {fmt(ylo + t)} {fmt(xlo + t)} {fmt(ylo)} {fmt(xlo + r)} {fmt(ylo)} c",
+        "h",
+    ]
+    return "\n".join(pts) + "\n"
+
+
+def qr_ops(qr, x_pt: float, y_pt: float, size_pt: float, border: int = 0) -> str:
+    """Dark modules of a segno QR as one filled path; size_pt includes the border modules."""
+    matrix = [tuple(row) for row in qr.matrix_iter(border=0, verbose=True)]
+    module = size_pt / (len(matrix) + 2 * border)
+    runs = "".join(
+        f"{x} {y} {length} 1 re\n"
+        for x, y, length in module_runs(matrix, FUNCTION_PATTERN_TYPES | LABEL_MODULE_TYPES)
+    )
+    ox, oy = x_pt + border * module, y_pt + border * module
+    return f"q {fmt(module, 6)} 0 0 {fmt(module, 6)} {fmt(ox)} {fmt(oy)} cm 0 g\n{runs}f Q\n"
+
+
+class DirectPDF:
+    """Streams a one-font PDF to disk page by page."""
+
+    def __init__(self, path: str, pagesize):
+        self.path = path
+        self.f = open(path, "wb")
+        self.offsets = {}       # object id -> byte offset
+        self.page_ids = []
+        self.page_offsets = {}  # page number (1-based) -> byte offset of the page object
+        self.next_id = RESOURCES_ID + 1
+        w, h = pagesize
+        self.media_box = f"[0 0 {fmt(w)} {fmt(h)}]".encode()
+
+        self.f.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self._write_obj(FONT_ID, f"<< /Type /Font /Subtype /Type1 /BaseFont /{FONT_NAME} "
+                                 f"/Encoding /WinAnsiEncoding >>".encode())
+        self._write_obj(RESOURCES_ID, f"<< /Font << /F1 {FONT_ID} 0 R >> >>".encode())
+
+    def _write_obj(self, obj_id: int, body: bytes):
+        self.offsets[obj_id] = self.f.tell()
+        self.f.write(b"%d 0 obj\n" % obj_id + body + b"\nendobj\n")
+
+    def _new_id(self) -> int:
+        obj_id = self.next_id
+        self.next_id += 1
+        return obj_id
+
+    def add_content(self, ops: str) -> int:
+        """Writes a compressed content stream and returns its object id (pages may share it)."""
+        data = zlib.compress(ops.encode("latin-1"))
+        obj_id = self._new_id()
+        self._write_obj(obj_id, b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(data)
+                        + data + b"\nendstream")
+        return obj_id
+
+    def add_page(self, content_id: int) -> int:
+        """Writes a page showing content_id and returns its 1-based page number."""
+        obj_id = self._new_id()
+        self._write_obj(obj_id, b"<< /Type /Page /Parent %d 0 R /MediaBox %s /Resources %d 0 R /Contents %d 0 R >>"
+                        % (PAGES_ID, self.media_box, RESOURCES_ID, content_id))
+        self.page_ids.append(obj_id)
+        page = len(self.page_ids)
+        self.page_offsets[page] = self.offsets[obj_id]
+        return page
+
+    def close(self):
+        """Writes the page tree, catalog, xref and trailer."""
+        kids = " ".join(f"{i} 0 R" for i in self.page_ids)
+        self._write_obj(PAGES_ID, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_ids)} >>".encode())
+        self._write_obj(CATALOG_ID, f"<< /Type /Catalog /Pages {PAGES_ID} 0 R >>".encode())
+
+        xref_offset = self.f.tell()
+        size = self.next_id
+        lines = [b"xref\n0 %d\n" % size, b"0000000000 65535 f \n"]
+        lines += [b"%010d 00000 n \n" % self.offsets[i] for i in range(1, size)]
+        self.f.write(b"".join(lines))
+        self.f.write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+                     % (size, CATALOG_ID, xref_offset))
+        self.f.close()
@@ -6,6 +6,12 @@ from reportlab.lib.units import mm
 from reportlab.graphics import renderPDF
 from svglib.svglib import svg2rlg
 import segno, io, pandas as pd
+import imposition
+import qr_segments
+import reprint
+import qr_stencil
+import pdf_direct
+import svg_preview
 
 # ----- Label & QR geometry (in mm) -----
 LABEL_W_MM, LABEL_H_MM = 76, 102          # physical label size
@@ -28,6 +34,44 @@ DF_PATH = "production_totes.csv"
 # ----- PDF out -----
 PDF_OUT = "labels.pdf"
 
+# ----- Copies -----
+# Identical labels printed per CSV row (e.g. one for the tote, one for the paperwork).
+# Each unique payload is encoded and drawn once as a Form XObject, every copy just references it.
+COPIES_PER_ROW = 1
+
+# ----- QR encoding -----
+# True = encode each payload with an optimal mix of numeric/alphanumeric/byte segments
+# (qr_segments.py) instead of segno's single-mode pick. Same decoded string, fewer bits.
+OPTIMIZE_SEGMENTS = False
+
+# ----- QR stencil -----
+# True = draw QR modules directly (no SVG round trip) and put each version's fixed function
+# patterns (finders, timing, alignment) into one shared Form XObject (qr_stencil.py).
+QR_STENCIL = False
+
+# ----- Reprint index -----
+# Writes <PDF_OUT>.index.csv (serial -> file, page, slot, byte offset, label box) and its
+# sorted fixed-width copy <PDF_OUT>.index.sorted for reprint.py.
+WRITE_INDEX = True
+
+# ----- Output backend -----
+# "reportlab" = canvas.Canvas, supports every option above.
+# "direct" = pdf_direct.py: precompiled content-stream templates with the QR path and text
+# spliced in, written page by page. One label per page only (SHEET / QR_STENCIL are ignored).
+# "svg" = svg_preview.py: one lightweight HTML file (PREVIEW_OUT) for QA review in a browser,
+# one label per CSV row with shared artwork in <defs>.
+BACKEND = "reportlab"
+PREVIEW_OUT = "labels_preview.html"
+
+# ----- Sheet imposition (N-up) -----
+# None = one label per page, sized to the label (thermal roll).
+# "letter" / "A4" tiles the labels onto sheets; 0 cols/rows fits as many as the sheet allows.
+SHEET = None
+SHEET_COLS, SHEET_ROWS = 0, 0
+SHEET_GUTTER_MM = 2.0
+SHEET_MARGIN_MM = 10.0
+CUT_MARKS = True
+
 # --- Border settings ---
 BORDER_RADIUS_MM = 2.0
 BORDER_LINE_WIDTH_PT = 0.5
@@ -43,8 +87,18 @@ def draw_label_border(c, label_w_mm: float, label_h_mm: float):
     c.roundRect(x * mm, y * mm, w * mm, h * mm, BORDER_RADIUS_MM * mm, stroke=1, fill=0)
     c.restoreState()
 
+def make_qr(data: str, error: str):
+    """segno.make, or the segment-optimized encoder when OPTIMIZE_SEGMENTS is on."""
+    if OPTIMIZE_SEGMENTS:
+        return qr_segments.make_qr(data, error=error)
+    return segno.make(data, error=error)
+
 def draw_qr_svg(canvas_obj, data: str, x_mm: float, y_mm: float, size_mm: float, error_level: str = "Q", border_modules: int = 4):
-    qr = segno.make(data, error=error_level)
+    qr = make_qr(data, error=error_level)
+    if QR_STENCIL:
+        qr_stencil.draw_qr(canvas_obj, qr, x_mm * mm, y_mm * mm, size_mm * mm, border=border_modules, stencil=True)
+        return
+
     buf = io.BytesIO()
     qr.save(buf, kind="svg", border=border_modules)
     buf.seek(0)
@@ -58,44 +112,170 @@ def draw_qr_svg(canvas_obj, data: str, x_mm: float, y_mm: float, size_mm: float,
 
     renderPDF.draw(drawing, canvas_obj, x_mm * mm, y_mm * mm)
 
+def tote_display_text(payload: str) -> str:
+    """"TOTE # <digits 10-14>" (ignoring spaces)."""
+    # e.g., "01 10 000 0100001 00 50" -> Index 9 to 14 is "00001"
+    stripped_payload = payload.replace(" ", "")
+    tote_id = stripped_payload[9:14]
+    return f"TOTE # {tote_id}"
+
+def draw_label(c, payload: str):
+    """Draws one complete label (QR, rotated text, border) for the given payload."""
+    # 1. Extract digits 10-14 (ignoring spaces)
+    display_text = tote_display_text(payload)
+
+    # 2. Draw the QR code
+    draw_qr_svg(
+        canvas_obj=c,
+        data=payload,
+        x_mm=QR_X_MM,
+        y_mm=QR_Y_MM,
+        size_mm=QR_SIZE_MM
+    )
+
+    # 3. Add Rotated Human Readable Text
+    c.saveState()
+    # Move the origin to where we want the text centered
+    c.translate(TEXT_X_MM * mm, QR_CENTER_Y_MM * mm)
+    c.rotate(90)  # Rotate CCW 90 degrees
+    c.setFont("Helvetica-Bold", 11)
+    # Draw centered at the new (0,0) origin
+    c.drawCentredString(0, 0, display_text)
+    c.restoreState()
+
+    # 4. Draw Border
+    draw_label_border(c, LABEL_W_MM, LABEL_H_MM)
+
+def label_form(c, payload: str, forms: dict) -> str:
+    """Returns the Form XObject name for payload, encoding and drawing it on first use only."""
+    name = forms.get(payload)
+    if name is None:
+        name = f"Label{len(forms)}"
+        c.beginForm(name, upperx=LABEL_W_MM * mm, uppery=LABEL_H_MM * mm)
+        draw_label(c, payload)
+        c.endForm()
+        forms[payload] = name
+    return name
+
+# ----- Direct backend template (same geometry as draw_label_border) -----
+DIRECT_BORDER = "q {lw} w 0 G\n{path}S Q\n".format(
+    lw=pdf_direct.fmt(BORDER_LINE_WIDTH_PT),
+    path=pdf_direct.round_rect_path(
+        BORDER_INSET_MM * mm,
+        BORDER_INSET_MM * mm,
+        (LABEL_W_MM - 2 * BORDER_INSET_MM) * mm,
+        (LABEL_H_MM - 2 * BORDER_INSET_MM) * mm,
+        BORDER_RADIUS_MM * mm,
+    ),
+)
+
+def direct_label(payload: str) -> str:
+    """Content stream for one label: QR path + rotated text + precompiled border."""
+    qr = make_qr(payload, error="Q")
+    return (
+        pdf_direct.qr_ops(qr, QR_X_MM * mm, QR_Y_MM * mm, QR_SIZE_MM * mm, border=4)
+        + pdf_direct.text_ops(tote_display_text(payload), 11, TEXT_X_MM * mm, QR_CENTER_Y_MM * mm, vertical=True)
+        + DIRECT_BORDER
+    )
+
+def write_labels_direct(df):
+    """BACKEND = "direct": same labels via pdf_direct, one label per page."""
+    pdf = pdf_direct.DirectPDF(PDF_OUT, (LABEL_W_MM * mm, LABEL_H_MM * mm))
+
+    contents = {}  # payload -> content stream object id, shared by copies and repeats
+    placements = []  # (serial, page, slot) of each row's first copy, for the reprint index
+
+    for _, row in df.iterrows():
+        payload = str(row["qr_data"])
+        content_id = contents.get(payload)
+        if content_id is None:
+            content_id = contents[payload] = pdf.add_content(direct_label(payload))
+
+        for copy in range(COPIES_PER_ROW):
+            page = pdf.add_page(content_id)
+            if copy == 0:
+                placements.append((payload, page, 0))
+
+    pdf.close()
+    if WRITE_INDEX:
+        reprint.write_index(reprint.index_path(PDF_OUT), PDF_OUT, placements, pdf.page_offsets,
+                            [(0, 0)], (LABEL_W_MM * mm, LABEL_H_MM * mm))
+        reprint.build_sorted_index(reprint.index_path(PDF_OUT))
+
+# ----- SVG preview template (same geometry as draw_label, y measured from the top) -----
+SVG_DEFS = (
+    f'<rect id="tote-border" x="{pdf_direct.fmt(BORDER_INSET_MM)}" y="{pdf_direct.fmt(BORDER_INSET_MM)}" '
+    f'width="{pdf_direct.fmt(LABEL_W_MM - 2 * BORDER_INSET_MM)}" height="{pdf_direct.fmt(LABEL_H_MM - 2 * BORDER_INSET_MM)}" '
+    f'rx="{BORDER_RADIUS_MM}" fill="none" stroke="black" '
+    f'stroke-width="{pdf_direct.fmt(BORDER_LINE_WIDTH_PT * svg_preview.PT_TO_MM)}"/>'
+)
+
+def svg_label(preview, payload: str) -> str:
+    """SVG markup for one label: QR data path + rotated text + shared border."""
+    qr = make_qr(payload, error="Q")
+    return (
+        preview.qr(qr, QR_X_MM, LABEL_H_MM - QR_Y_MM - QR_SIZE_MM, QR_SIZE_MM, border=4)
+        + svg_preview.text(TEXT_X_MM, LABEL_H_MM - QR_CENTER_Y_MM, 11, tote_display_text(payload), rotate=True)
+        + '<use href="#tote-border"/>'
+    )
+
+def write_preview(df):
+    """BACKEND = "svg": every row once, streamed into PREVIEW_OUT."""
+    preview = svg_preview.SVGPreview(PREVIEW_OUT, LABEL_W_MM, LABEL_H_MM, SVG_DEFS, title=DF_PATH)
+    for _, row in df.iterrows():
+        payload = str(row["qr_data"])
+        preview.add_label(svg_label(preview, payload), caption=payload)
+    preview.close()
+
 def main():
     df = pd.read_csv(DF_PATH, dtype={"qr_data": "string"})
-    c = canvas.Canvas(PDF_OUT, pagesize=(LABEL_W_MM * mm, LABEL_H_MM * mm))
+    if BACKEND == "svg":
+        write_preview(df)
+        print(f"Wrote {PREVIEW_OUT}")
+        return
+
+    if BACKEND == "direct":
+        write_labels_direct(df)
+        print(f"Wrote {PDF_OUT}")
+        return
+
+    pagesize, slots = imposition.page_layout(
+        SHEET, LABEL_W_MM, LABEL_H_MM, SHEET_COLS, SHEET_ROWS, SHEET_GUTTER_MM, SHEET_MARGIN_MM
+    )
+    c = canvas.Canvas(PDF_OUT, pagesize=pagesize)
+    cut_marks = CUT_MARKS and SHEET is not None
+    if cut_marks:
+        imposition.define_cut_marks(c, slots, LABEL_W_MM, LABEL_H_MM)
+
+    forms = {}  # payload -> Form XObject name
+    placements = []  # (serial, page, slot) of each row's first copy, for the reprint index
+    slot = 0
+
+    # Forms only pay off when something reuses them (copies, N-up, repeated payloads);
+    # otherwise draw straight onto the page, which is smaller and faster
+    reuse_all = COPIES_PER_ROW > 1 or SHEET is not None
+    repeated = set(df["qr_data"][df["qr_data"].duplicated()].astype(str))
 
     for _, row in df.iterrows():
         payload = str(row["qr_data"])
-        
-        # 1. Extract digits 10-14 (ignoring spaces)
-        # e.g., "01 10 000 0100001 00 50" -> Index 9 to 14 is "00001"
-        stripped_payload = payload.replace(" ", "")
-        tote_id = stripped_payload[9:14]
-        display_text = f"TOTE # {tote_id}"
-
-        # 2. Draw the QR code
-        draw_qr_svg(
-            canvas_obj=c,
-            data=payload,
-            x_mm=QR_X_MM,
-            y_mm=QR_Y_MM,
-            size_mm=QR_SIZE_MM
-        )
-
-        # 3. Add Rotated Human Readable Text
-        c.saveState()
-        # Move the origin to where we want the text centered
-        c.translate(TEXT_X_MM * mm, QR_CENTER_Y_MM * mm)
-        c.rotate(90)  # Rotate CCW 90 degrees
-        c.setFont("Helvetica-Bold", 11)
-        # Draw centered at the new (0,0) origin
-        c.drawCentredString(0, 0, display_text)
-        c.restoreState()
-
-        # 4. Draw Border
-        draw_label_border(c, LABEL_W_MM, LABEL_H_MM)
-
-        c.showPage()
+        placements.append((payload, c.getPageNumber(), slot))
+
+        if not reuse_all and payload not in repeated:
+            draw_label(c, payload)
+            c.showPage()
+            continue
+
+        form_name = label_form(c, payload, forms)
+        for _ in range(COPIES_PER_ROW):
+            slot = imposition.place_label(c, form_name, slots, slot, cut_marks)
+
+    imposition.finish_page(c, slot)
 
     c.save()
+    if WRITE_INDEX:
+        reprint.write_index(reprint.index_path(PDF_OUT), PDF_OUT, placements, reprint.canvas_page_offsets(c),
+                            slots, (LABEL_W_MM * mm, LABEL_H_MM * mm))
+        reprint.build_sorted_index(reprint.index_path(PDF_OUT))
     print(f"Wrote {PDF_OUT}")
 
 if __name__ == "__main__":
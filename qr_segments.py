@@ -0,0 +1,178 @@
+# qr_segments.py
+# Optimal QR segment-mode mixing (numeric / alphanumeric / byte) for label payloads
+# segno.make picks ONE mode for the whole string. Payloads like "01 21 000 0110101 00 CS"
+# are mostly digit runs separated by spaces, so splitting them into numeric and alphanumeric
+# segments can need fewer bits -> smaller version -> fewer modules to encode, mask and draw.
+# The decoded string is unchanged: the segments simply concatenate back to the payload,
+# and every byte segment uses the same encoding (ISO-8859-1, or UTF-8 if any character is
+# outside it). segno would otherwise guess an encoding per segment, e.g. Shift_JIS for "Жx".
+
+import sys
+import segno
+from segno import consts
+import pandas as pd
+
+NUMERIC, ALPHANUMERIC, BYTE = consts.MODE_NUMERIC, consts.MODE_ALPHANUMERIC, consts.MODE_BYTE
+MODES = (NUMERIC, ALPHANUMERIC, BYTE)
+ALPHANUMERIC_CHARS = set("0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ $%*+-./:")
+
+# Mixed-script payloads whose byte segments would decode differently if their encodings differed
+ROUND_TRIP_PAYLOADS = [
+    "ü12345678901234567890Жx",
+    "01 21 000 0110101 00 Ж",
+    "Straße 12345678901234567890 CS",
+    "日本 12345678901234567890 ü",
+]
+
+# Character count indicator bits per mode for versions 1-9, 10-26, 27-40
+VERSION_RANGES = ((1, 9), (10, 26), (27, 40))
+CHAR_COUNT_BITS = {
+    NUMERIC: (10, 12, 14),
+    ALPHANUMERIC: (9, 11, 13),
+    BYTE: (8, 16, 16),
+}
+
+
+def byte_encoding(data: str) -> str:
+    """The one byte-mode encoding for the whole payload: ISO-8859-1 if every character fits, else UTF-8.
+
+    Scanners read byte segments without an ECI as ISO-8859-1 or sniff UTF-8, so mixing
+    encodings between segments would change the decoded string.
+    """
+    return "iso-8859-1" if all(ord(ch) < 256 for ch in data) else "utf-8"
+
+
+def char_costs(ch: str, encoding: str = "iso-8859-1"):
+    """Cost of one character in each mode, in 1/6 bit units (None = not encodable in that mode)."""
+    return (
+        20 if ch.isdigit() and ch.isascii() else None,      # 10 bits / 3 digits
+        33 if ch in ALPHANUMERIC_CHARS else None,           # 11 bits / 2 chars
+        48 * len(ch.encode(encoding)),                      # 8 bits per byte in the payload's encoding
+    )
+
+
+def optimal_segments(data: str, range_index: int = 0, encoding: str = None):
+    """Returns [(text, mode), ...] with the fewest total bits for the given version range.
+
+    Byte segments are priced in encoding (default: byte_encoding(data)); encode them with
+    that same encoding, as make_qr does.
+
+    Dynamic programming over the payload: best[m] is the cheapest encoding of the prefix
+    that ends inside an open segment of mode m. Switching mode costs a new segment header
+    (4 mode bits + character count bits) and rounds the closed segment up to a whole bit.
+    """
+    if not data:
+        return [(data, BYTE)]
+    encoding = encoding or byte_encoding(data)
+    # Non-ASCII payloads open with a byte segment: decoders such as OpenCV's settle the
+    # charset on the first segment and drop the whole symbol if a non-ASCII byte segment
+    # only shows up after a numeric / alphanumeric one
+    byte_first = not data.isascii()
+
+    head = [(4 + CHAR_COUNT_BITS[m][range_index]) * 6 for m in MODES]
+    ceil6 = lambda cost: (cost + 5) // 6 * 6
+    inf = sys.maxsize  # Not encodable (int so ceil6 stays exact)
+
+    best = None
+    came_from = []  # came_from[i][m] = mode of char i-1 when char i ends in mode m
+    for ch in data:
+        costs = char_costs(ch, encoding)
+        cur = [inf] * len(MODES)
+        prev_modes = [None] * len(MODES)
+        for m, char_cost in enumerate(costs):
+            if char_cost is None:
+                continue
+            if best is None:
+                if not byte_first or MODES[m] == BYTE:
+                    cur[m] = head[m] + char_cost
+                continue
+            for k in range(len(MODES)):
+                if best[k] == inf:
+                    continue
+                cost = best[k] + char_cost if k == m else ceil6(best[k]) + head[m] + char_cost
+                if cost < cur[m]:
+                    cur[m], prev_modes[m] = cost, k
+        best = cur
+        came_from.append(prev_modes)
+
+    # Walk back from the cheapest final mode, then group runs of equal mode into segments
+    mode = min(range(len(MODES)), key=lambda m: ceil6(best[m]))
+    char_modes = []
+    for prev_modes in reversed(came_from):
+        char_modes.append(mode)
+        mode = prev_modes[mode]
+    char_modes.reverse()
+
+    segments = []
+    start = 0
+    for i in range(1, len(data) + 1):
+        if i == len(data) or char_modes[i] != char_modes[start]:
+            segments.append((data[start:i], MODES[char_modes[start]]))
+            start = i
+    return segments
+
+
+def make_qr(data: str, error: str = "M", micro: bool = False, **kwargs):
+    """Drop-in for segno.make(data, error=...) that encodes data with optimally mixed segments.
+
+    Always a regular QR unless micro=True is asked for: the smaller segments must not silently
+    turn a payload into a Micro QR, which many floor scanners cannot read.
+    """
+    encoding = kwargs.pop("encoding", None) or byte_encoding(data)
+    qr = None
+    for range_index, (_, max_version) in enumerate(VERSION_RANGES):
+        # encoding= applies to every byte segment, so segno never picks one per segment
+        qr = segno.make(optimal_segments(data, range_index, encoding), error=error, micro=micro,
+                        encoding=encoding, **kwargs)
+        # Segment costs depend on the version range; accept once the symbol lands inside it
+        if qr.is_micro or qr.version <= max_version:
+            break
+    return qr
+
+
+def decode(qr) -> str:
+    """Reads qr back with OpenCV's detector (needs opencv-python), "" if nothing was found.
+
+    The detectors miss some clean symbols at one scale and find them at another, so a few
+    scales are tried; the first text that is found is returned, right or wrong.
+    """
+    import cv2, numpy as np
+    detectors = [cv2.QRCodeDetector()]
+    if hasattr(cv2, "QRCodeDetectorAruco"):  # OpenCV >= 4.8
+        detectors.append(cv2.QRCodeDetectorAruco())
+    for scale in (3, 4, 5, 7, 9, 11):
+        image = np.array([[0 if dark else 255 for dark in row] for row in qr.matrix_iter(scale=scale, border=4)],
+                         dtype=np.uint8)
+        for detector in detectors:
+            text = detector.detectAndDecode(image)[0]
+            if text:
+                return text
+    return ""
+
+
+def main(csv_path: str, error: str = "M"):
+    """Reports plain vs optimized symbol version for every payload in a qr_data CSV.
+
+    Also decodes every optimized symbol, plus the mixed-script ROUND_TRIP_PAYLOADS, and
+    lists any that do not read back as the original payload.
+    """
+    df = pd.read_csv(csv_path, dtype={"qr_data": "string"})
+    smaller = 0
+    mismatches = []
+    for payload in [str(v) for v in df["qr_data"]] + ROUND_TRIP_PAYLOADS:
+        plain = segno.make(payload, error=error)
+        optimized = make_qr(payload, error=error)
+        if optimized.symbol_size(border=0) < plain.symbol_size(border=0):
+            smaller += 1
+        decoded = decode(optimized)
+        if decoded != payload:
+            mismatches.append((payload, decoded))
+        print(f"{payload}\t{plain.designator} -> {optimized.designator}")
+    print(f"{smaller}/{len(df) + len(ROUND_TRIP_PAYLOADS)} payloads encode into a smaller symbol")
+    for payload, decoded in mismatches:
+        print(f"Round trip FAILED: {payload!r} decoded as {decoded!r}")
+    print(f"{len(mismatches)} round-trip failures")
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
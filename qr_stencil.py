@@ -0,0 +1,77 @@
+# qr_stencil.py
+# Draws segno QR matrices straight onto a ReportLab canvas as filled module runs
+# With stencil=True the fixed function patterns of each symbol version (finder, separator,
+# timing and alignment patterns + the dark module) go into ONE shared Form XObject per
+# version; every label then only emits its own data and format/version modules.
+
+from segno import consts
+
+# Identical for every symbol of a given version
+FUNCTION_PATTERN_TYPES = {
+    consts.TYPE_FINDER_PATTERN_DARK,
+    consts.TYPE_ALIGNMENT_PATTERN_DARK,
+    consts.TYPE_TIMING_DARK,
+    consts.TYPE_DARKMODULE,
+}
+# Depend on the payload / error level / mask
+LABEL_MODULE_TYPES = {
+    consts.TYPE_DATA_DARK,
+    consts.TYPE_FORMAT_DARK,
+    consts.TYPE_VERSION_DARK,
+}
+
+
+def module_runs(matrix, types):
+    """Yields (x, y, length) horizontal runs of modules whose type is in types (y counted from the bottom)."""
+    n = len(matrix)
+    for r, row in enumerate(matrix):
+        y = n - r - 1
+        x = 0
+        while x < n:
+            if row[x] in types:
+                start = x
+                while x < n and row[x] in types:
+                    x += 1
+                yield start, y, x - start
+            else:
+                x += 1
+
+
+def fill_runs(c, matrix, types):
+    """Fills all runs as a single path, in module units."""
+    p = c.beginPath()
+    for x, y, length in module_runs(matrix, types):
+        p.rect(x, y, length, 1)
+    c.drawPath(p, stroke=0, fill=1)
+
+
+def stencil_form(c, qr, matrix) -> str:
+    """Returns the shared function-pattern Form XObject for qr's version, defining it on first use."""
+    name = f"QRStencil{qr.version}"
+    if not c.hasForm(name):
+        n = len(matrix)
+        c.beginForm(name, upperx=n, uppery=n)
+        fill_runs(c, matrix, FUNCTION_PATTERN_TYPES)
+        c.endForm()
+    return name
+
+
+def draw_qr(c, qr, x_pt: float, y_pt: float, size_pt: float, border: int = 0, stencil: bool = False):
+    """Draws qr with its bottom-left corner at (x_pt, y_pt); size_pt includes the border modules."""
+    matrix = [tuple(row) for row in qr.matrix_iter(border=0, verbose=True)]
+    n = len(matrix)
+    module = size_pt / (n + 2 * border)
+
+    # Define the stencil before touching this stream's graphics state
+    stencil_name = stencil_form(c, qr, matrix) if stencil else None
+
+    c.saveState()
+    c.translate(x_pt + border * module, y_pt + border * module)
+    c.scale(module, module)
+    c.setFillColorRGB(0, 0, 0)
+    if stencil_name:
+        c.doForm(stencil_name)
+        fill_runs(c, matrix, LABEL_MODULE_TYPES)
+    else:
+        fill_runs(c, matrix, FUNCTION_PATTERN_TYPES | LABEL_MODULE_TYPES)
+    c.restoreState()
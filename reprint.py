@@ -0,0 +1,267 @@
+# reprint.py
+# Random-access reprint of a single damaged label from a finished run
+# The renderers write <PDF_OUT>.index.csv while they run: serial -> volume file, page,
+# slot on the page (N-up sheets), byte offset of that page object in the PDF and the
+# label's box on the page. At the end of the run it is sorted into a fixed-width
+# <PDF_OUT>.index.sorted, so a lookup is a binary search over a handful of records.
+# The reprint copies the ORIGINAL page (and only the objects it uses) out of the stored
+# volume, cropped to the label, so it is exactly the artwork that was printed, whatever
+# the renderer settings are now. Only the standard library is imported.
+#   python reprint.py robot_labels.pdf "01 11 000 0100123 00 45" [out.pdf]
+
+import bisect, csv, os, re, sys
+
+INDEX_HEADER = ["serial", "file", "page", "slot", "offset", "box"]
+
+OBJ_RE = re.compile(rb"\s*(\d+) 0 obj\s*")
+BODY_END_RE = re.compile(rb"\bstream\r?\n|\bendobj")
+REF_RE = re.compile(rb"(\d+) 0 R")
+PARENT_RE = re.compile(rb"/Parent\s+\d+ 0 R")
+MEDIA_BOX_RE = re.compile(rb"/MediaBox\s*\[[^\]]*\]")
+LENGTH_RE = re.compile(rb"/Length\s+(\d+)\b(?!\s+\d+\s+R)")
+XREF_ENTRY_LEN = 20  # "0000012345 00000 n \n"
+
+
+def index_path(pdf_out: str) -> str:
+    """robot_labels.pdf -> robot_labels.index.csv"""
+    root, _ = os.path.splitext(pdf_out)
+    return f"{root}.index.csv"
+
+
+def sorted_index_path(path: str) -> str:
+    """robot_labels.index.csv -> robot_labels.index.sorted"""
+    root, _ = os.path.splitext(path)
+    return f"{root}.sorted"
+
+
+def canvas_page_offsets(c) -> dict:
+    """Page number -> byte offset of each page object of a canvas that was just saved.
+
+    Taken from ReportLab's own xref bookkeeping (filled in by c.save()), so it costs nothing extra.
+    """
+    return {page: c._doc.idToOffset[f"Page{page}"] for page in range(1, c._doc.pageCounter)}
+
+
+def fmt_numbers(*values: float) -> str:
+    """Space-separated numbers with at most 4 decimals (the index box column, PDF boxes)."""
+    return " ".join(f"{v:.4f}".rstrip("0").rstrip(".") for v in values)
+
+
+def write_index(path: str, pdf_path: str, placements, page_offsets: dict, slots, label_size,
+                append: bool = False):
+    """Writes one index row per (serial, page, slot) placement in pdf_path.
+
+    slots are the (x, y) label positions on a page and label_size its (w, h), all in points.
+    """
+    new_file = not (append and os.path.exists(path))
+    label_w, label_h = label_size
+    with open(path, "w" if new_file else "a", newline="") as f:
+        writer = csv.writer(f)
+        if new_file:
+            writer.writerow(INDEX_HEADER)
+        for serial, page, slot in placements:
+            x, y = slots[slot]
+            writer.writerow([serial, os.path.basename(pdf_path), page, slot, page_offsets[page],
+                             fmt_numbers(x, y, label_w, label_h)])
+
+
+def build_sorted_index(path: str):
+    """Sorts the index CSV by serial into fixed-width tab-separated records.
+
+    Every line (header included) is padded to the same length, so record i starts at
+    (i + 1) * record length and lookup() can binary search it with a few seeks.
+    Rows for the same serial keep their print order; lookup() returns the first one.
+    """
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        rows = sorted(reader, key=lambda row: row[0])
+
+    lines = ["\t".join(header)] + ["\t".join(row) for row in rows]
+    width = max(len(line.encode("utf-8")) for line in lines)
+    tmp_path = sorted_index_path(path) + ".tmp"
+    with open(tmp_path, "wb") as f:
+        for line in lines:
+            data = line.encode("utf-8")
+            f.write(data + b" " * (width - len(data)) + b"\n")
+    os.replace(tmp_path, sorted_index_path(path))
+
+
+class SortedIndex:
+    """Read-only sequence view of the serials in a sorted index file, for bisect."""
+
+    def __init__(self, f):
+        self.f = f
+        self.header = f.readline()
+        self.record_len = len(self.header)
+        self.count = os.fstat(f.fileno()).st_size // self.record_len - 1
+
+    def __len__(self):
+        return self.count
+
+    def record(self, i: int) -> list:
+        self.f.seek((i + 1) * self.record_len)
+        return self.f.read(self.record_len).decode("utf-8").rstrip(" \n").split("\t")
+
+    def __getitem__(self, i: int) -> str:
+        return self.record(i)[0]
+
+
+def lookup(path: str, serial: str):
+    """Returns the index row for serial as a dict, or None if it was never printed.
+
+    (Re)builds the sorted index first if the run did not get to it (e.g. it crashed).
+    """
+    sorted_path = sorted_index_path(path)
+    if not os.path.exists(sorted_path) or os.path.getmtime(sorted_path) < os.path.getmtime(path):
+        build_sorted_index(path)
+
+    with open(sorted_path, "rb") as f:
+        index = SortedIndex(f)
+        i = bisect.bisect_left(index, serial)
+        if i == len(index):
+            return None
+        record = index.record(i)
+        if record[0] != serial:
+            return None
+        header = index.header.decode("utf-8").rstrip(" \n").split("\t")
+        return dict(zip(header, record))
+
+
+def read_object(f, offset: int):
+    """Returns (object number, body, stream data or None) of the PDF object at offset."""
+    f.seek(offset)
+    data = b""
+    while True:
+        more = f.read(4096)
+        data += more
+        end = BODY_END_RE.search(data)
+        if end or not more:
+            break
+    head = OBJ_RE.match(data)
+    if head is None or end is None:
+        raise ValueError(f"no PDF object at byte offset {offset}")
+
+    body = data[head.end():end.start()].strip()
+    if end.group().startswith(b"endobj"):
+        return int(head.group(1)), body, None
+    length = LENGTH_RE.search(body)
+    if length is None:
+        raise ValueError(f"object {head.group(1).decode()} has no direct /Length")
+    f.seek(offset + end.end())
+    return int(head.group(1)), body, f.read(int(length.group(1)))
+
+
+def xref_reader(f):
+    """Returns a function object number -> byte offset, reading single xref entries on demand."""
+    f.seek(0, os.SEEK_END)
+    f.seek(max(0, f.tell() - 1024))
+    tail = f.read()
+    xref_offset = int(re.findall(rb"startxref\s+(\d+)", tail)[-1])
+
+    f.seek(xref_offset)
+    if f.readline().strip() != b"xref":
+        raise ValueError("only classic xref tables are supported")
+    first, _ = f.readline().split()
+    if int(first) != 0:
+        raise ValueError("only single-section xref tables are supported")
+    entries_offset = f.tell()
+
+    def offset_of(obj_id: int) -> int:
+        f.seek(entries_offset + obj_id * XREF_ENTRY_LEN)
+        return int(f.read(10))
+    return offset_of
+
+
+def extract_page(pdf_path: str, page_offset: int, out_path: str, box=None):
+    """Copies the page object at page_offset and everything it references into a 1-page PDF.
+
+    box = (x, y, w, h) in points crops the page to one label (N-up sheets).
+    Works for the files our writers produce: ReportLab and pdf_direct, both uncompressed
+    object structure with a classic xref table.
+    """
+    with open(pdf_path, "rb") as f:
+        offset_of = xref_reader(f)
+        page_id, page_body, _ = read_object(f, page_offset)
+        page_body = PARENT_RE.sub(b"", page_body)
+        media_box = MEDIA_BOX_RE.search(page_body)
+        if box is not None and media_box is not None:
+            x, y, w, h = box
+            page_box = [float(v) for v in media_box.group()[len(b"/MediaBox"):].strip(b" []").split()]
+            # Label smaller than the page (N-up sheet): crop to it
+            if any(abs(a - b) > 0.01 for a, b in zip(page_box, (x, y, x + w, y + h))):
+                page_body = MEDIA_BOX_RE.sub(f"/MediaBox [{fmt_numbers(x, y, x + w, y + h)}]".encode(), page_body)
+
+        # Page = object 3, then everything it reaches in breadth-first order
+        objects = {page_id: (page_body, None)}
+        new_ids = {page_id: 3}
+        queue = [page_id]
+        while queue:
+            body = objects[queue.pop(0)][0]
+            for ref in REF_RE.findall(body):
+                obj_id = int(ref)
+                if obj_id not in new_ids:
+                    new_ids[obj_id] = len(new_ids) + 3
+                    _, obj_body, stream = read_object(f, offset_of(obj_id))
+                    objects[obj_id] = (obj_body, stream)
+                    queue.append(obj_id)
+
+    renumber = lambda body: REF_RE.sub(lambda m: b"%d 0 R" % new_ids[int(m.group(1))], body)
+    offsets = []
+    with open(out_path, "wb") as out:
+        out.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+        def write_obj(body: bytes):
+            offsets.append(out.tell())
+            out.write(b"%d 0 obj\n" % len(offsets) + body + b"\nendobj\n")
+
+        write_obj(b"<< /Type /Catalog /Pages 2 0 R >>")
+        write_obj(b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>")
+        for obj_id, _ in sorted(new_ids.items(), key=lambda item: item[1]):
+            body, stream = objects[obj_id]
+            body = renumber(body)
+            if obj_id == page_id:
+                body = body.replace(b"<<", b"<< /Parent 2 0 R", 1)
+            if stream is not None:
+                body += b"\nstream\n" + stream + b"\nendstream"
+            write_obj(body)
+
+        xref_offset = out.tell()
+        out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(offsets) + 1))
+        out.write(b"".join(b"%010d 00000 n \n" % offset for offset in offsets))
+        out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+                  % (len(offsets) + 1, xref_offset))
+
+
+def reprint(pdf_out: str, serial: str, out_path: str = None):
+    """Extracts the printed label for serial from the run whose PDF_OUT was pdf_out."""
+    path = index_path(pdf_out)
+    if not os.path.exists(path):
+        print(f"Error: {path} not found. Was the run made with WRITE_INDEX = True?")
+        return
+
+    entry = lookup(path, serial)
+    if entry is None:
+        print(f"Error: {serial} is not in {path}")
+        return
+    print(f"{serial}: {entry['file']} page {entry['page']} slot {entry['slot']} (byte offset {entry['offset']})")
+
+    # Volumes sit next to their index
+    pdf_path = os.path.join(os.path.dirname(path), entry["file"])
+    if not os.path.exists(pdf_path):
+        print(f"Error: {pdf_path} not found, cannot reprint from it.")
+        return
+
+    if out_path is None:
+        root, _ = os.path.splitext(pdf_out)
+        out_path = f"{root}_reprint.pdf"
+    box = tuple(float(v) for v in entry["box"].split()) if entry.get("box") else None
+    extract_page(pdf_path, int(entry["offset"]), out_path, box)
+    print(f"Wrote {out_path}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: python reprint.py <PDF_OUT of the run, e.g. robot_labels.pdf> <serial> [out.pdf]")
+        sys.exit(1)
+    reprint(*sys.argv[1:])
@@ -7,6 +7,13 @@ from reportlab.lib.units import mm
 from reportlab.graphics import renderPDF
 from svglib.svglib import svg2rlg
 import segno, io, pandas as pd
+import json, os
+import imposition
+import qr_segments
+import reprint
+import qr_stencil
+import pdf_direct
+import svg_preview
 
 # ----- Label & QR geometry (in mm) -----
 # 1 inch = 25.4 mm
@@ -27,6 +34,57 @@ FONT_SIZE = 10
 DF_PATH = "robot_serials.csv"
 PDF_OUT = "robot_labels.pdf"
 
+# ----- Copies -----
+# Identical labels printed per CSV row. Each unique payload is encoded and drawn
+# once as a Form XObject, every copy just references it.
+COPIES_PER_ROW = 1
+
+# ----- QR encoding -----
+# True = encode each payload with an optimal mix of numeric/alphanumeric/byte segments
+# (qr_segments.py) instead of segno's single-mode pick. Same decoded string, fewer bits.
+OPTIMIZE_SEGMENTS = False
+
+# ----- QR stencil -----
+# True = draw QR modules directly (no SVG round trip) and put each version's fixed function
+# patterns (finders, timing, alignment) into one shared Form XObject (qr_stencil.py).
+QR_STENCIL = False
+
+# ----- Reprint index -----
+# Writes <PDF_OUT>.index.csv (serial -> file, page, slot, byte offset, label box) and its
+# sorted fixed-width copy <PDF_OUT>.index.sorted for reprint.py.
+WRITE_INDEX = True
+
+# ----- Output backend -----
+# "reportlab" = canvas.Canvas, supports every option above.
+# "direct" = pdf_direct.py: precompiled content-stream templates with the QR path and SN
+# spliced in, written page by page. One label per page only (SHEET / QR_STENCIL are ignored).
+# "svg" = svg_preview.py: one lightweight HTML file (PREVIEW_OUT) for QA review in a browser,
+# one label per CSV row with shared artwork in <defs>.
+BACKEND = "reportlab"
+PREVIEW_OUT = "robot_labels_preview.html"
+
+# ----- Sheet imposition (N-up) -----
+# None = one label per page, sized to the label (thermal roll).
+# "letter" / "A4" tiles the labels onto sheets; 0 cols/rows fits as many as the sheet allows.
+SHEET = None
+SHEET_COLS, SHEET_ROWS = 0, 0
+SHEET_GUTTER_MM = 2.0
+SHEET_MARGIN_MM = 10.0
+CUT_MARKS = True
+
+# ----- Checkpointing (for 100k+ label runs) -----
+# With VOLUME_SIZE > 0 the run is split into volumes of that many CSV rows
+# (robot_labels_0001.pdf, robot_labels_0002.pdf, ...). After each volume is saved
+# the checkpoint records the last fully written row, and RESUME = True continues
+# with the next volume. Volumes are written with invariant=1 so a resumed run is
+# byte-identical to an uninterrupted one; resuming is refused if the input, VOLUME_SIZE or
+# any output setting (run_settings()) changed. 0 writes a single PDF_OUT as before, with
+# NO checkpoints (RESUME = True is refused, and long runs print a warning).
+VOLUME_SIZE = 0
+UNCHECKPOINTED_WARN_ROWS = 50000
+CHECKPOINT_PATH = "robot_labels.checkpoint.json"
+RESUME = False
+
 # --- Border settings (Optional, mostly for visual debugging on white paper) ---
 BORDER_RADIUS_MM = 1.0
 BORDER_LINE_WIDTH_PT = 0.5
@@ -43,9 +101,19 @@ def draw_label_border(c, label_w_mm: float, label_h_mm: float):
     c.roundRect(x * mm, y * mm, w * mm, h * mm, BORDER_RADIUS_MM * mm, stroke=1, fill=0)
     c.restoreState()
 
+def make_qr(data: str, error: str):
+    """segno.make, or the segment-optimized encoder when OPTIMIZE_SEGMENTS is on."""
+    if OPTIMIZE_SEGMENTS:
+        return qr_segments.make_qr(data, error=error)
+    return segno.make(data, error=error)
+
 def draw_qr_svg(canvas_obj, data: str, x_mm: float, y_mm: float, size_mm: float, error_level: str = "H"):
     # error='H' (High) is CRITICAL here. It allows up to 30% of the code to be covered/damaged.
-    qr = segno.make(data, error=error_level)
+    qr = make_qr(data, error=error_level)
+    if QR_STENCIL:
+        qr_stencil.draw_qr(canvas_obj, qr, x_mm * mm, y_mm * mm, size_mm * mm, stencil=True)
+        return
+
     buf = io.BytesIO()
     
     # border=0 because we are positioning it manually and don't want extra whitespace
@@ -89,6 +157,202 @@ def draw_center_overlay(c, text: str, label_w_mm, label_h_mm):
     
     c.restoreState()
 
+def extract_robot_sn(payload: str) -> str:
+    """Digits 13-14 of the payload (ignoring spaces)."""
+    # Remove spaces
+    stripped_payload = payload.replace(" ", "")
+
+    try:
+        robot_sn = stripped_payload[12:14]  # 0-based index, so 12 and 13 are the 13th and 14th characters
+        #print(robot_sn)  # Debug: Print extracted SN to verify correctness
+    except IndexError:
+        robot_sn = "??"
+        print(f"Warning: Payload too short for SN extraction: {payload}")
+    return robot_sn
+
+def draw_label(c, payload: str):
+    """Draws one complete label (QR + center overlay) for the given payload."""
+    # 1. Extract Digits
+    robot_sn = extract_robot_sn(payload)
+
+    # 2. Draw the QR code (High Error Correction)
+    draw_qr_svg(
+        canvas_obj=c,
+        data=payload,
+        x_mm=QR_X_MM,
+        y_mm=QR_Y_MM,
+        size_mm=QR_SIZE_MM,
+        error_level="H" 
+    )
+
+    # 3. Draw the Center Overlay
+    draw_center_overlay(c, robot_sn, LABEL_W_MM, LABEL_H_MM)
+
+    # 4. Draw Label Border (optional)
+    #draw_label_border(c, LABEL_W_MM, LABEL_H_MM)
+
+def label_form(c, payload: str, forms: dict) -> str:
+    """Returns the Form XObject name for payload, encoding and drawing it on first use only."""
+    name = forms.get(payload)
+    if name is None:
+        name = f"Label{len(forms)}"
+        c.beginForm(name, upperx=LABEL_W_MM * mm, uppery=LABEL_H_MM * mm)
+        draw_label(c, payload)
+        c.endForm()
+        forms[payload] = name
+    return name
+
+# ----- Direct backend template (same geometry as draw_center_overlay) -----
+DIRECT_CENTER_X = (LABEL_W_MM / 2) * mm
+DIRECT_CENTER_Y = (LABEL_H_MM / 2) * mm
+DIRECT_OVERLAY = "q 1 g 1 G {x} {y} {s} {s} re B Q\n".format(
+    x=pdf_direct.fmt(DIRECT_CENTER_X - (OVERLAY_SIZE_MM / 2) * mm),
+    y=pdf_direct.fmt(DIRECT_CENTER_Y - (OVERLAY_SIZE_MM / 2) * mm),
+    s=pdf_direct.fmt(OVERLAY_SIZE_MM * mm),
+)
+
+def direct_label(payload: str) -> str:
+    """Content stream for one label: QR path + precompiled overlay box + the SN text."""
+    qr = make_qr(payload, error="H")
+    return (
+        pdf_direct.qr_ops(qr, QR_X_MM * mm, QR_Y_MM * mm, QR_SIZE_MM * mm)
+        + DIRECT_OVERLAY
+        + pdf_direct.text_ops(extract_robot_sn(payload), FONT_SIZE, DIRECT_CENTER_X, DIRECT_CENTER_Y - FONT_SIZE * 0.35)
+    )
+
+def write_labels_direct(df, out_path: str, append_index: bool = False):
+    """BACKEND = "direct" version of write_labels: one label per page via pdf_direct."""
+    tmp_path = out_path + ".part"
+    pdf = pdf_direct.DirectPDF(tmp_path, (LABEL_W_MM * mm, LABEL_H_MM * mm))
+
+    contents = {}  # payload -> content stream object id, shared by copies and repeats
+    placements = []  # (serial, page, slot) of each row's first copy, for the reprint index
+
+    for _, row in df.iterrows():
+        payload = str(row["qr_data"])
+        content_id = contents.get(payload)
+        if content_id is None:
+            content_id = contents[payload] = pdf.add_content(direct_label(payload))
+
+        for copy in range(COPIES_PER_ROW):
+            page = pdf.add_page(content_id)
+            if copy == 0:
+                placements.append((payload, page, 0))
+
+    pdf.close()
+    os.replace(tmp_path, out_path)
+    if WRITE_INDEX:
+        reprint.write_index(reprint.index_path(PDF_OUT), out_path, placements, pdf.page_offsets,
+                            [(0, 0)], (LABEL_W_MM * mm, LABEL_H_MM * mm), append=append_index)
+
+# ----- SVG preview template (same geometry as draw_label, y measured from the top) -----
+SVG_OVERLAY_X_MM = (LABEL_W_MM - OVERLAY_SIZE_MM) / 2
+SVG_OVERLAY_Y_MM = (LABEL_H_MM - OVERLAY_SIZE_MM) / 2
+SVG_DEFS = (
+    f'<rect id="overlay" width="{OVERLAY_SIZE_MM}" height="{OVERLAY_SIZE_MM}" fill="white" '
+    f'stroke="white" stroke-width="{pdf_direct.fmt(svg_preview.PT_TO_MM)}"/>'
+)
+
+def svg_label(preview, payload: str) -> str:
+    """SVG markup for one label: QR data path + shared overlay box + the SN text."""
+    qr = make_qr(payload, error="H")
+    return (
+        preview.qr(qr, QR_X_MM, LABEL_H_MM - QR_Y_MM - QR_SIZE_MM, QR_SIZE_MM)
+        + f'<use href="#overlay" x="{pdf_direct.fmt(SVG_OVERLAY_X_MM)}" y="{pdf_direct.fmt(SVG_OVERLAY_Y_MM)}"/>'
+        + svg_preview.text(LABEL_W_MM / 2, LABEL_H_MM / 2 + FONT_SIZE * 0.35 * svg_preview.PT_TO_MM,
+                           FONT_SIZE, extract_robot_sn(payload))
+    )
+
+def write_preview(df):
+    """BACKEND = "svg": every row once, streamed into PREVIEW_OUT."""
+    preview = svg_preview.SVGPreview(PREVIEW_OUT, LABEL_W_MM, LABEL_H_MM, SVG_DEFS, title=DF_PATH)
+    for _, row in df.iterrows():
+        payload = str(row["qr_data"])
+        preview.add_label(svg_label(preview, payload), caption=payload)
+    preview.close()
+
+def load_checkpoint(path):
+    """Returns the saved checkpoint dict, or None if there is none."""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def save_checkpoint(path, state):
+    """Atomically replaces the checkpoint file so a crash never leaves it half written."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def run_settings() -> dict:
+    """Settings that shape the volumes; a resumed run must use the same ones as the volumes on disk."""
+    return {
+        "backend": BACKEND,
+        "copies_per_row": COPIES_PER_ROW,
+        "sheet": SHEET,
+        "sheet_grid": [SHEET_COLS, SHEET_ROWS],
+        "sheet_gutter_mm": SHEET_GUTTER_MM,
+        "sheet_margin_mm": SHEET_MARGIN_MM,
+        "cut_marks": CUT_MARKS,
+        "optimize_segments": OPTIMIZE_SEGMENTS,
+        "qr_stencil": QR_STENCIL,
+        "write_index": WRITE_INDEX,
+    }
+
+def volume_path(volume: int) -> str:
+    """robot_labels.pdf -> robot_labels_0001.pdf for volume 1."""
+    root, ext = os.path.splitext(PDF_OUT)
+    return f"{root}_{volume:04d}{ext}"
+
+def write_labels(df, out_path: str, invariant: int = 0, append_index: bool = False):
+    """Writes every row of df to one PDF, saved under out_path only once complete."""
+    if BACKEND == "direct":
+        write_labels_direct(df, out_path, append_index)
+        return
+
+    # Render to a temp name first so a crash never leaves a truncated volume behind
+    tmp_path = out_path + ".part"
+    pagesize, slots = imposition.page_layout(
+        SHEET, LABEL_W_MM, LABEL_H_MM, SHEET_COLS, SHEET_ROWS, SHEET_GUTTER_MM, SHEET_MARGIN_MM
+    )
+    c = canvas.Canvas(tmp_path, pagesize=pagesize, invariant=invariant)
+    cut_marks = CUT_MARKS and SHEET is not None
+    if cut_marks:
+        imposition.define_cut_marks(c, slots, LABEL_W_MM, LABEL_H_MM)
+
+    forms = {}  # payload -> Form XObject name
+    placements = []  # (serial, page, slot) of each row's first copy, for the reprint index
+    slot = 0
+
+    # Forms only pay off when something reuses them (copies, N-up, repeated payloads);
+    # otherwise draw straight onto the page, which is smaller and faster
+    reuse_all = COPIES_PER_ROW > 1 or SHEET is not None
+    repeated = set(df["qr_data"][df["qr_data"].duplicated()].astype(str))
+
+    for _, row in df.iterrows():
+        payload = str(row["qr_data"])
+        placements.append((payload, c.getPageNumber(), slot))
+
+        if not reuse_all and payload not in repeated:
+            draw_label(c, payload)
+            c.showPage()
+            continue
+
+        form_name = label_form(c, payload, forms)
+        for _ in range(COPIES_PER_ROW):
+            slot = imposition.place_label(c, form_name, slots, slot, cut_marks)
+
+    imposition.finish_page(c, slot)
+
+    c.save()
+    os.replace(tmp_path, out_path)
+    if WRITE_INDEX:
+        reprint.write_index(reprint.index_path(PDF_OUT), out_path, placements, reprint.canvas_page_offsets(c),
+                            slots, (LABEL_W_MM * mm, LABEL_H_MM * mm), append=append_index)
+
 def main():
     try:
         df = pd.read_csv(DF_PATH, dtype={"qr_data": "string"})
@@ -96,43 +360,66 @@ def main():
         print(f"Error: {DF_PATH} not found. Please create a dummy CSV to test.")
         return
 
-    c = canvas.Canvas(PDF_OUT, pagesize=(LABEL_W_MM * mm, LABEL_H_MM * mm))
+    if BACKEND == "svg":
+        write_preview(df)
+        print(f"Successfully generated {PREVIEW_OUT}")
+        return
+
+    if not VOLUME_SIZE:
+        if RESUME:
+            print("Error: RESUME = True needs VOLUME_SIZE > 0; single-file runs have no checkpoints.")
+            return
+        if len(df) > UNCHECKPOINTED_WARN_ROWS:
+            print(f"Warning: {len(df)} rows with VOLUME_SIZE = 0 -> no checkpoints, a crash means starting over.")
+        write_labels(df, PDF_OUT)
+        if WRITE_INDEX:
+            reprint.build_sorted_index(reprint.index_path(PDF_OUT))
+        print(f"Successfully generated {PDF_OUT}")
+        return
 
-    for _, row in df.iterrows():
-        payload = str(row["qr_data"])
-        
-        # 1. Extract Digits
-        # Remove spaces
-        stripped_payload = payload.replace(" ", "")
-        
-
-        try:
-            robot_sn = stripped_payload[12:14]  # 0-based index, so 12 and 13 are the 13th and 14th characters
-            #print(robot_sn)  # Debug: Print extracted SN to verify correctness
-        except IndexError:
-            robot_sn = "??"
-            print(f"Warning: Payload too short for SN extraction: {payload}")
-
-        # 2. Draw the QR code (High Error Correction)
-        draw_qr_svg(
-            canvas_obj=c,
-            data=payload,
-            x_mm=QR_X_MM,
-            y_mm=QR_Y_MM,
-            size_mm=QR_SIZE_MM,
-            error_level="H" 
-        )
-
-        # 3. Draw the Center Overlay
-        draw_center_overlay(c, robot_sn, LABEL_W_MM, LABEL_H_MM)
-
-        # 4. Draw Label Border (optional)
-        #draw_label_border(c, LABEL_W_MM, LABEL_H_MM)
-
-        c.showPage()
+    index_path = reprint.index_path(PDF_OUT)
+    next_row = 0
+    checkpoint = load_checkpoint(CHECKPOINT_PATH) if RESUME else None
+    if checkpoint is not None:
+        if checkpoint["input"] != DF_PATH or checkpoint["volume_size"] != VOLUME_SIZE:
+            print(f"Error: {CHECKPOINT_PATH} belongs to a different run, not resuming.")
+            return
+        if checkpoint.get("settings") != run_settings():
+            print(f"Error: settings changed since {CHECKPOINT_PATH} was written "
+                  f"(was {checkpoint.get('settings')}), not resuming.")
+            return
+        next_row = checkpoint["last_row"] + 1
+        print(f"Resuming at row {next_row} (volume {next_row // VOLUME_SIZE + 1})")
+        if WRITE_INDEX and "index_offset" in checkpoint and os.path.exists(index_path):
+            # Drop index rows of a volume that was written but never checkpointed
+            with open(index_path, "r+") as f:
+                f.truncate(checkpoint["index_offset"])
+        elif WRITE_INDEX:
+            print(f"Warning: {index_path} cannot be rolled back to this checkpoint; "
+                  f"reprint lookups for rows before {next_row} may be missing or stale.")
 
-    c.save()
-    print(f"Successfully generated {PDF_OUT}")
+    for start in range(next_row, len(df), VOLUME_SIZE):
+        volume = start // VOLUME_SIZE + 1
+        chunk = df.iloc[start:start + VOLUME_SIZE]
+        out_path = volume_path(volume)
+        write_labels(chunk, out_path, invariant=1, append_index=start > 0)
+        save_checkpoint(CHECKPOINT_PATH, {
+            "input": DF_PATH,
+            "volume_size": VOLUME_SIZE,
+            "settings": run_settings(),
+            "last_row": start + len(chunk) - 1,
+            "volume": volume,
+            "index_offset": os.path.getsize(index_path) if WRITE_INDEX else 0,
+        })
+        print(f"Wrote {out_path}")
+
+    if WRITE_INDEX:
+        reprint.build_sorted_index(index_path)
+
+    # Run finished cleanly, nothing left to resume
+    if os.path.exists(CHECKPOINT_PATH):
+        os.remove(CHECKPOINT_PATH)
+    print(f"Successfully generated {volume_path(1)} .. {volume_path((len(df) - 1) // VOLUME_SIZE + 1)}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,4 +1,6 @@
 import csv
+import json
+import os
 
 ###Variables for Serial Generation
 ITEM_TOTE = "10"
@@ -8,6 +10,13 @@ OUTPUT_CSV = "production_bags.csv"
 LABEL_COUNT = 200
 LABEL_START_NUM = 101
 
+###Checkpointing (for multi-million serial runs)
+# Every CHECKPOINT_EVERY rows the CSV is flushed to disk and the last fully written
+# serial number + byte offset are recorded. RESUME = True continues from there.
+CHECKPOINT_EVERY = 100000
+CHECKPOINT_PATH = OUTPUT_CSV + ".checkpoint.json"
+RESUME = False
+
 def calculate_pure_mod97(base_string):
     """Calculates the pure remainder (Modulo 97)."""
     # Remove spaces and treat the entire string as one large integer
@@ -16,6 +25,22 @@ def calculate_pure_mod97(base_string):
     # Return as a 2-digit string (e.g., 07)
     return f"{remainder:02d}"
 
+def load_checkpoint(path):
+    """Returns the saved checkpoint dict, or None if there is none."""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def save_checkpoint(path, state):
+    """Atomically replaces the checkpoint file so a crash never leaves it half written."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
 def generate_serials(count):
     filename = OUTPUT_CSV
     header = ["qr_data"]
@@ -25,11 +50,30 @@ def generate_serials(count):
     prefix = f"01 {ITEM_BAG} 000"
     suffix_fixed = "00"
     
-    with open(filename, mode='w', newline='') as file:
+    start_num = LABEL_START_NUM
+    checkpoint = load_checkpoint(CHECKPOINT_PATH) if RESUME else None
+    if checkpoint is not None:
+        # The start number also sets the checkpoint cadence, so it must match as well
+        if (checkpoint["output"] != filename or checkpoint["prefix"] != prefix
+                or checkpoint.get("start_num") != LABEL_START_NUM or checkpoint.get("count") != count):
+            print(f"Error: {CHECKPOINT_PATH} belongs to a different run, not resuming.")
+            return
+        if not os.path.exists(filename) or os.path.getsize(filename) < checkpoint["offset"]:
+            print(f"Error: {filename} is missing or shorter than {CHECKPOINT_PATH} says, not resuming.")
+            return
+        start_num = checkpoint["last_num"] + 1
+        print(f"Resuming from serial {start_num} (offset {checkpoint['offset']})")
+
+    with open(filename, mode='r+' if checkpoint else 'w', newline='') as file:
         writer = csv.writer(file)
-        writer.writerow(header)
+        if checkpoint:
+            # Drop anything written after the last checkpoint (possibly a torn row)
+            file.truncate(checkpoint["offset"])
+            file.seek(checkpoint["offset"])
+        else:
+            writer.writerow(header)
         
-        for i in range(LABEL_START_NUM, count + 1):
+        for i in range(start_num, count + 1):
             # 01XXXXX format with 5 digits for the 'X' count
             # This results in a 7-digit block: '01' + '00001'
             serial_int_field = f"01{i:05d}"
@@ -44,6 +88,22 @@ def generate_serials(count):
             full_serial = f"{base_str} {cs}"
             writer.writerow([full_serial])
 
+            if CHECKPOINT_EVERY and (i - LABEL_START_NUM + 1) % CHECKPOINT_EVERY == 0:
+                file.flush()
+                os.fsync(file.fileno())
+                save_checkpoint(CHECKPOINT_PATH, {
+                    "output": filename,
+                    "prefix": prefix,
+                    "start_num": LABEL_START_NUM,
+                    "count": count,
+                    "last_num": i,
+                    "offset": file.tell(),
+                })
+
+    # Run finished cleanly, nothing left to resume
+    if os.path.exists(CHECKPOINT_PATH):
+        os.remove(CHECKPOINT_PATH)
+
     print(f"Success! {count} serials saved to {filename}")
 
 if __name__ == "__main__":
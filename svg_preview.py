@@ -0,0 +1,109 @@
+# svg_preview.py
+# Single-file HTML/SVG preview of a label batch for QA review in the browser
+# Shared artwork (icon, frame, and each QR version's function patterns incl. the finder
+# patterns) is defined once in <defs> and placed with <use>; every label only carries its
+# QR data modules as one compact path + its text. Labels are written to disk as they come,
+# and content-visibility lets the browser skip off-screen labels, so 10k+ labels stay light.
+# All coordinates are in mm with the SVG origin top-left (y down).
+
+import re
+from html import escape
+from qr_stencil import module_runs, FUNCTION_PATTERN_TYPES, LABEL_MODULE_TYPES
+from pdf_direct import fmt
+
+PT_TO_MM = 25.4 / 72
+FONT_FAMILY = "Helvetica, Arial, sans-serif"
+
+HTML_HEAD = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{title}</title>
+<style>
+body {{ font-family: {font}; background: #ddd; margin: 12px; }}
+.sheet {{ display: flex; flex-wrap: wrap; gap: 8px; }}
+.cell {{ content-visibility: auto; contain-intrinsic-size: {w}mm {h}mm; background: #fff; }}
+.cell svg {{ display: block; }}
+.cell span {{ display: block; font-size: 9px; padding: 2px; color: #555; }}
+</style></head><body>
+<h3>{title}</h3>
+<svg width="0" height="0" style="position:absolute"><defs>
+{defs}
+</defs></svg>
+<div class="sheet">
+"""
+HTML_TAIL = """</div>
+</body></html>
+"""
+
+
+def runs_path(matrix, types) -> str:
+    """Compact path data for modules whose type is in types, y down.
+
+    Each horizontal run is a 1-module wide stroke along its centre line (like segno's own SVG
+    output), with relative moves between runs, so the path needs stroke-width 1 and no fill.
+    """
+    n = len(matrix)
+    parts = []
+    cx = cy = None  # pen position after the previous run
+    for x, y, length in module_runs(matrix, types):
+        y = n - 1 - y
+        if cx is None:
+            parts.append(f"M{x} {y}.5h{length}")
+        else:
+            parts.append(f"m{x - cx} {y - cy}h{length}")
+        cx, cy = x + length, y
+    return "".join(parts)
+
+
+def svg_group(svg: str, group_id: str) -> str:
+    """Turns a standalone <svg> string (e.g. icon_gen.get_bag_icon()) into a <g> for <defs>.
+
+    Place it with <use transform="translate(..) scale(..)">, in units of the source viewBox.
+    """
+    m = re.match(r"\s*<svg([^>]*)>(.*)</svg>\s*$", svg, re.S)
+    attrs = " ".join(re.findall(r'\bfill="[^"]*"', m.group(1)))
+    return f'<g id="{group_id}" {attrs}>{m.group(2)}</g>'
+
+
+def text(x_mm: float, y_mm: float, font_size_pt: float, value: str, rotate: bool = False) -> str:
+    """Bold text centred on x (baseline at y) like drawCentredString; rotate=True reads bottom to top."""
+    transform = f' transform="rotate(-90 {fmt(x_mm)} {fmt(y_mm)})"' if rotate else ""
+    return (f'<text x="{fmt(x_mm)}" y="{fmt(y_mm)}" font-size="{fmt(font_size_pt * PT_TO_MM)}" '
+            f'font-weight="bold" text-anchor="middle"{transform}>{escape(value)}</text>')
+
+
+class SVGPreview:
+    """Streams labels into one HTML file, one small inline <svg> per label."""
+
+    def __init__(self, path: str, label_w_mm: float, label_h_mm: float, defs: str = "", title: str = ""):
+        self.path = path
+        self.label_w_mm = label_w_mm
+        self.label_h_mm = label_h_mm
+        self.stencils = set()  # QR versions whose function patterns are already in <defs>
+        self.f = open(path, "w", encoding="utf-8")
+        self.f.write(HTML_HEAD.format(title=escape(title or path), font=FONT_FAMILY,
+                                      w=fmt(label_w_mm), h=fmt(label_h_mm), defs=defs))
+
+    def qr(self, qr, x_mm: float, y_mm: float, size_mm: float, border: int = 0) -> str:
+        """Markup for qr with its top-left corner at (x_mm, y_mm); size_mm includes the border modules."""
+        matrix = [tuple(row) for row in qr.matrix_iter(border=0, verbose=True)]
+        stencil_id = f"qr-{qr.version}"
+        if qr.version not in self.stencils:
+            # First symbol of this version: stream its function patterns as a new <defs> block
+            self.f.write(f'<svg width="0" height="0" style="position:absolute"><defs>'
+                         f'<path id="{stencil_id}" stroke="#000" d="{runs_path(matrix, FUNCTION_PATTERN_TYPES)}"/>'
+                         f'</defs></svg>\n')
+            self.stencils.add(qr.version)
+
+        module = size_mm / (len(matrix) + 2 * border)
+        ox, oy = x_mm + border * module, y_mm + border * module
+        return (f'<g transform="translate({fmt(ox)} {fmt(oy)}) scale({fmt(module)})">'
+                f'<use href="#{stencil_id}"/><path stroke="#000" d="{runs_path(matrix, LABEL_MODULE_TYPES)}"/></g>')
+
+    def add_label(self, body: str, caption: str = ""):
+        """Writes one label (SVG markup in label mm coordinates) with an optional caption."""
+        w, h = fmt(self.label_w_mm), fmt(self.label_h_mm)
+        self.f.write(f'<div class="cell"><svg viewBox="0 0 {w} {h}" width="{w}mm" height="{h}mm" '
+                     f'font-family="{FONT_FAMILY}">{body}</svg><span>{escape(caption)}</span></div>\n')
+
+    def close(self):
+        self.f.write(HTML_TAIL)
+        self.f.close()